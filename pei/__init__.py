@@ -0,0 +1,7 @@
+"""Pedestrian Environment Index (PEI) generators.
+
+Importing the package does no work and loads no geospatial dependencies; use the ``pei`` command or
+import the subindex modules (``pei.pdi``, ``pei.cdi``, ``pei.idi``, ``pei.ldi``) directly.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from .config import get_census_api_key
+from .overpass import format_bbox, overpass_query
+
+# GEOID prefix length of each census level a 12-digit block group GEOID rolls up into; the full GEOID
+# gives the block group level itself, so its indices come out of the same groupby as the roll-ups
+GEOID_LEVELS = {"blockgroup": 12, "tract": 11, "county": 5}
+COUNT_COLUMNS = ["Land Area", "Polygon Area", "Population Count", "Commercial Count", "Intersection Count"]
+LANDUSE_PREFIX = "landuse:"
+
+
+def _overpass_elements(query):
+    """
+    Runs an Overpass query through the response cache and returns its elements.
+    Failures raise instead of returning nothing, since an empty county would silently get zero counts.
+    """
+    return overpass_query(query, kind="blockgroups", timeout=600).get('elements', [])
+
+
+def fetch_county_pois(bbox, year):
+    """
+    Fetches commercial points of interest for a whole county bounding box in one request.
+    Args:
+        bbox (str): "south,west,north,east" in EPSG:4326.
+        year (int): Year for which data is being fetched.
+    Returns:
+        list: shapely Points in EPSG:4326.
+    """
+    from shapely.geometry import Point
+
+    query = f"""
+    [out:json][timeout:600][date:"{year}-01-01T00:00:00Z"];
+    (
+      node["shop"]({bbox});
+      node["amenity"~"restaurant|cafe|bank|school|cinema"]({bbox});
+      node["leisure"~"park|sports_centre|stadium"]({bbox});
+    );
+    out body;
+    """
+    return [Point(e['lon'], e['lat']) for e in _overpass_elements(query) if 'lat' in e and 'lon' in e]
+
+
+def fetch_county_intersections(bbox, year):
+    """
+    Fetches street intersections (nodes shared by more than one highway way) for a county bounding box.
+    Returns:
+        list: shapely Points in EPSG:4326.
+    """
+    from shapely.geometry import Point
+
+    query = f"""
+    [out:json][timeout:600][date:"{year}-01-01T00:00:00Z"];
+    way[highway]({bbox});
+    out body;
+    >;
+    out skel qt;
+    """
+    elements = _overpass_elements(query)
+    node_degree = defaultdict(int)
+    coordinates = {}
+    for element in elements:
+        if element['type'] == 'way' and 'nodes' in element:
+            for node_id in element['nodes']:
+                node_degree[node_id] += 1
+        elif element['type'] == 'node':
+            coordinates[element['id']] = (element['lon'], element['lat'])
+    return [Point(coordinates[n]) for n, degree in node_degree.items() if degree > 1 and n in coordinates]
+
+
+def fetch_county_landuse(bbox, year):
+    """
+    Fetches land use polygons for a county bounding box.
+    Returns:
+        GeoDataFrame: 'landuse' and 'geometry' columns in EPSG:4326.
+    """
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    query = f"""
+    [out:json][timeout:600][date:"{year}-01-01T00:00:00Z"];
+    (
+      way["landuse"]({bbox});
+      relation["landuse"]({bbox});
+    );
+    out geom;
+    """
+    landuse_types = []
+    geometries = []
+    for element in _overpass_elements(query):
+        coords = [(pt['lon'], pt['lat']) for pt in element.get('geometry', [])]
+        if len(coords) >= 3:
+            geometries.append(Polygon(coords).buffer(0))
+            landuse_types.append(element.get('tags', {}).get('landuse', ''))
+    return gpd.GeoDataFrame({'landuse': landuse_types, 'geometry': geometries}, crs="EPSG:4326")
+
+
+def get_blockgroup_population(bg_gdf, census_api_key, year):
+    """
+    Retrieves ACS 5-year total population for every block group, one Census call per county.
+    Returns:
+        pd.Series: Population indexed by 12-digit block group GEOID.
+    """
+    from census import Census
+
+    c = Census(get_census_api_key(census_api_key))
+    census_pop = []
+    for county in bg_gdf["GEOID"].str[:5].unique():
+        census_pop.extend(c.acs5.state_county_blockgroup('B01003_001E', county[:2], county[2:], Census.ALL, year=year))
+    census_pop_df = pd.DataFrame(census_pop)
+    geoids = census_pop_df['state'] + census_pop_df['county'] + census_pop_df['tract'] + census_pop_df['block group']
+    return pd.Series(census_pop_df['B01003_001E'].astype(float).values, index=geoids)
+
+
+def compute_blockgroup_counts(bg_gdf, year, census_api_key):
+    """
+    Computes the additive raw measures for every block group: areas, population, POI and intersection
+    counts, and land use area per type clipped to the block group.
+
+    OSM data is fetched once per county bounding box and assigned to block groups with spatial joins,
+    instead of one request per polygon.
+    Args:
+        bg_gdf (GeoDataFrame): Block group polygons with a 12-digit 'GEOID' and optionally 'ALAND'.
+        year (int): Year for which data is fetched.
+        census_api_key (str): The Census API key, or None to use the configured key.
+    Returns:
+        pd.DataFrame: One row per block group with 'GEOID', 'year', COUNT_COLUMNS and one
+            'landuse:<type>' area column per land use type (square meters).
+    Raises:
+        requests.RequestException: If a county's Overpass request fails. Counties fetched before the
+            failure are cached, so rerunning resumes from the failed county.
+    """
+    import geopandas as gpd
+    import requests
+
+    bg_gdf = bg_gdf.drop_duplicates("GEOID").reset_index(drop=True)
+    bg = bg_gdf[["GEOID", "geometry"]].to_crs(epsg=3857)
+    bg_bounds = bg_gdf.to_crs(epsg=4326).bounds
+
+    counts = pd.DataFrame({"GEOID": bg["GEOID"], "year": year})
+    counts["Land Area"] = bg_gdf["ALAND"].astype(float) if "ALAND" in bg_gdf.columns else bg.area
+    counts["Polygon Area"] = bg.area
+    counts["Population Count"] = get_blockgroup_population(bg_gdf, census_api_key, year).reindex(bg["GEOID"]).values
+
+    poi_counts, intersection_counts, landuse_areas = [], [], []
+    counties = bg["GEOID"].str[:5]
+    for idx, (county, county_bg) in enumerate(bg.groupby(counties)):
+        print(f"  Fetching county {county} ({idx + 1}/{counties.nunique()}) for year {year}...")
+        minx, miny = bg_bounds.loc[county_bg.index, ["minx", "miny"]].min()
+        maxx, maxy = bg_bounds.loc[county_bg.index, ["maxx", "maxy"]].max()
+        bbox = format_bbox((minx, miny, maxx, maxy))
+
+        try:
+            pois = fetch_county_pois(bbox, year)
+            intersections = fetch_county_intersections(bbox, year)
+            landuse = fetch_county_landuse(bbox, year).to_crs(epsg=3857)
+        except requests.RequestException as e:
+            print(f"  Overpass request for county {county} in {year} failed: {e}")
+            raise
+
+        for points, results in ((pois, poi_counts), (intersections, intersection_counts)):
+            points = gpd.GeoDataFrame(geometry=points, crs="EPSG:4326").to_crs(epsg=3857)
+            joined = gpd.sjoin(points, county_bg, how="inner", predicate="within")
+            results.append(joined.groupby("GEOID").size())
+
+        if len(landuse):
+            pieces = gpd.overlay(landuse, county_bg, how="intersection", keep_geom_type=True)
+            pieces["area"] = pieces.geometry.area
+            landuse_areas.append(pieces.groupby(["GEOID", "landuse"])["area"].sum())
+
+    for column, parts in (("Commercial Count", poi_counts), ("Intersection Count", intersection_counts)):
+        totals = pd.concat(parts) if parts else pd.Series(dtype=float)
+        counts[column] = totals.reindex(counts["GEOID"], fill_value=0).values
+
+    if landuse_areas:
+        landuse_wide = pd.concat(landuse_areas).unstack("landuse", fill_value=0).add_prefix(LANDUSE_PREFIX)
+        counts = counts.merge(landuse_wide, left_on="GEOID", right_index=True, how="left")
+        landuse_columns = list(landuse_wide.columns)
+        counts[landuse_columns] = counts[landuse_columns].fillna(0)
+    return counts
+
+
+def build_membership(bg_gdf, city_gdf=None, city_id="STPLFIPS"):
+    """
+    Builds the block group -> unit weights for every roll-up level in one long table.
+
+    Block groups, tracts and counties nest exactly, so they are read from GEOID prefixes with weight 1. Cities do not
+    follow census boundaries, so each block group contributes the share of its area inside the city.
+    Args:
+        bg_gdf (GeoDataFrame): Block group polygons with a 12-digit 'GEOID'.
+        city_gdf (GeoDataFrame): Optional city polygons, e.g. CityBoundaries.shp.
+        city_id (str): Column of city_gdf identifying each city.
+    Returns:
+        pd.DataFrame: Columns 'level', 'unit', 'GEOID' and 'weight'.
+    """
+    import geopandas as gpd
+
+    geoids = bg_gdf["GEOID"].drop_duplicates()
+    members = [
+        pd.DataFrame({"level": level, "unit": geoids.str[:length], "GEOID": geoids, "weight": 1.0})
+        for level, length in GEOID_LEVELS.items()
+    ]
+
+    if city_gdf is not None:
+        bg = bg_gdf.drop_duplicates("GEOID")[["GEOID", "geometry"]].to_crs(epsg=3857)
+        bg_area = pd.Series(bg.geometry.area.values, index=bg["GEOID"])
+        cities = city_gdf[[city_id, "geometry"]].to_crs(epsg=3857)
+        pieces = gpd.overlay(bg, cities, how="intersection", keep_geom_type=True)
+        pieces["weight"] = pieces.geometry.area / bg_area.reindex(pieces["GEOID"]).values
+        city_members = pieces.groupby([city_id, "GEOID"], as_index=False)["weight"].sum()
+        members.append(pd.DataFrame({
+            "level": "city",
+            "unit": city_members[city_id].astype(str),
+            "GEOID": city_members["GEOID"],
+            "weight": city_members["weight"].clip(upper=1.0),
+        }))
+    return pd.concat(members, ignore_index=True)
+
+
+def rollup_counts(counts, membership):
+    """
+    Rolls block group measures up to every level in a single weighted groupby pass.
+    Args:
+        counts (pd.DataFrame): Output of compute_blockgroup_counts, one or more years.
+        membership (pd.DataFrame): Output of build_membership.
+    Returns:
+        pd.DataFrame: One row per ('level', 'unit', 'year') with the summed measures.
+    """
+    measures = [c for c in counts.columns if c not in ("GEOID", "year")]
+    merged = membership.merge(counts, on="GEOID", how="inner")
+    merged[measures] = merged[measures].fillna(0).mul(merged["weight"], axis=0)
+    return merged.groupby(["level", "unit", "year"], sort=False)[measures].sum().reset_index()
+
+
+def compute_rollup_indices(totals):
+    """
+    Derives densities, land use entropy and the four subindices from rolled-up measures.
+    Subindices are normalized by the maximum within each level and year, as the tract generators do.
+    """
+    totals = totals.copy()
+    totals["Population Density"] = totals["Population Count"] / (totals["Land Area"] / 10**6)
+    totals["Commercial Density"] = totals["Commercial Count"] / totals["Polygon Area"]
+    totals["Intersection Density"] = totals["Intersection Count"] / totals["Polygon Area"]
+
+    landuse = totals[[c for c in totals.columns if c.startswith(LANDUSE_PREFIX)]].to_numpy(dtype=float)
+    total_area = landuse.sum(axis=1, keepdims=True)
+    k = (landuse > 0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = landuse / total_area
+        numerator = -np.where(p > 0, p * np.log(p), 0).sum(axis=1)
+        totals["Entropy"] = np.where(k > 1, numerator / np.log(np.maximum(k, 2)), 0)
+
+    totals = totals.replace([np.inf, -np.inf], np.nan)
+    groups = totals.groupby(["level", "year"])
+    for index, column, scale in (("PDI", "Population Density", 100), ("CDI", "Commercial Density", 1),
+                                 ("IDI", "Intersection Density", 1), ("LDI", "Entropy", 1)):
+        max_value = groups[column].transform("max")
+        totals[index] = totals[column] / max_value.where(max_value > 0, 1) * scale
+    return totals
+
+
+def run_blockgroup_rollup(bg_geojson, years, census_api_key=None, output_prefix="blockgroups", city_file=None,
+                          city_id="STPLFIPS"):
+    """
+    Computes block group measures once per year and writes the indices of the block groups and of their tract,
+    county and city roll-ups.
+    Outputs {output_prefix}_{year}_counts.csv (block group level) and {output_prefix}_{year}_rollup.csv.
+    """
+    import geopandas as gpd
+
+    bg_gdf = gpd.read_file(bg_geojson)
+    city_gdf = gpd.read_file(city_file) if city_file else None
+    membership = build_membership(bg_gdf, city_gdf, city_id)
+    for year in years:
+        print(f"Processing year {year}...")
+        counts = compute_blockgroup_counts(bg_gdf, year, census_api_key)
+        counts.to_csv(f"{output_prefix}_{year}_counts.csv", index=False)
+
+        rollup = compute_rollup_indices(rollup_counts(counts, membership))
+        rollup.to_csv(f"{output_prefix}_{year}_rollup.csv", index=False)
+        print(f"Processed {year}. Outputs saved to '{output_prefix}_{year}_counts.csv' and "
+              f"'{output_prefix}_{year}_rollup.csv'.")
+
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from .overpass import format_bbox, overpass_query
+from .store import AggregateStore
+def commercial_query(bounds, year):
+    """
+    Builds the Overpass query for commercial points of interest.
+    Args:
+        bounds (tuple): (minx, miny, maxx, maxy) in EPSG:4326.
+        year (int): Year for which data is being fetched.
+    Returns:
+        str: Overpass QL query.
+    """
+    bbox = format_bbox(bounds)
+    return f"""
+    [out:json][timeout:60][date:"{year}-01-01T00:00:00Z"];
+    (
+      node["shop"]({bbox});
+      node["amenity"~"restaurant|cafe|bank|school|cinema"]({bbox});
+      node["leisure"~"park|sports_centre|stadium"]({bbox});
+    );
+    out body;
+    """
+def fetch_commercial_data(bounds, year):
+    """
+    Fetches commercial data using Overpass API for a given bounding box and year.
+    Args:
+        bounds (tuple): (minx, miny, maxx, maxy) of the geographic area in EPSG:4326.
+        year (int): Year for which data is being fetched.
+    Returns:
+        dict: OSM node id -> shapely Point of each commercial point of interest.
+    """
+    import requests
+    from shapely.geometry import Point
+
+    try:
+        elements = overpass_query(commercial_query(bounds, year), kind="cdi").get('elements', [])
+    except requests.RequestException as e:
+        print(f"Error fetching data from Overpass API: {e}")
+        return {}
+    return {
+        element['id']: Point(element['lon'], element['lat'])
+        for element in elements if 'lat' in element and 'lon' in element
+    }
+def expand_bounds(bounds, meters):
+    """
+    Grows (minx, miny, maxx, maxy) EPSG:4326 bounds by a distance in meters on every side.
+    """
+    minx, miny, maxx, maxy = bounds
+    dlat = meters / 111_320
+    dlon = meters / (111_320 * max(np.cos(np.radians(max(abs(miny), abs(maxy)))), 0.01))
+    return (minx - dlon, miny - dlat, maxx + dlon, maxy + dlat)
+def accessibility_margin(radii=(400, 800), bandwidth=None):
+    """
+    Returns the distance in meters by which each tract bbox is grown so POIs just outside a tract still
+    count toward its accessibility: the largest radius, or three kernel bandwidths if that is larger.
+    """
+    return max(max(radii), 3 * (bandwidth or 0))
+def poi_accessibility(poi_xy, origin_xy, radii=(400, 800), bandwidth=None):
+    """
+    Measures commercial accessibility from many origins at once with a KD-tree over the POIs.
+    Args:
+        poi_xy (np.ndarray): (n, 2) deduplicated POI coordinates in a projected CRS (meters).
+        origin_xy (np.ndarray): (m, 2) origin coordinates in the same CRS.
+        radii (tuple): Walk radii in meters; each gives the number of POIs within that distance.
+        bandwidth (float): If set, also computes a Gaussian kernel-weighted POI sum with this
+            bandwidth in meters, truncated at three bandwidths.
+    Returns:
+        dict: Column name -> array of length m.
+    """
+    from scipy.spatial import cKDTree
+
+    results = {f"POI Within {r}m": np.zeros(len(origin_xy)) for r in radii}
+    if bandwidth:
+        results["POI Kernel Sum"] = np.zeros(len(origin_xy))
+    if len(poi_xy) == 0 or len(origin_xy) == 0:
+        return results
+
+    tree = cKDTree(poi_xy)
+    for r in radii:
+        results[f"POI Within {r}m"] = tree.query_ball_point(origin_xy, r, return_length=True, workers=-1).astype(float)
+    if bandwidth:
+        pairs = cKDTree(origin_xy).sparse_distance_matrix(tree, 3 * bandwidth, output_type="ndarray")
+        kernel = np.exp(-0.5 * (pairs["v"] / bandwidth) ** 2)
+        results["POI Kernel Sum"] = np.bincount(pairs["i"], weights=kernel, minlength=len(origin_xy))
+    return results
+def utm_epsg(lon, lat):
+    """
+    Returns the EPSG code of the WGS 84 UTM zone (326xx north, 327xx south) of each longitude/latitude.
+    """
+    zone = np.floor((np.asarray(lon, dtype=float) + 180) / 6).astype(int) % 60 + 1
+    return np.where(np.asarray(lat, dtype=float) >= 0, 32600, 32700) + zone
+def projected_accessibility(poi_lonlat, origin_lonlat, radii=(400, 800), bandwidth=None):
+    """
+    Runs poi_accessibility with both POIs and origins projected into the UTM zone of each origin.
+
+    UTM's scale error stays within 0.1% inside a zone at any latitude, whereas a single national
+    projection such as CONUS Albers (EPSG:5070) is only that accurate in CONUS and distorts distances
+    by 3-4% in Hawaii and Puerto Rico and 12-20% in Alaska. Origins are grouped by zone, and each group
+    only projects the POIs within the accessibility margin of its origins.
+    Args:
+        poi_lonlat (np.ndarray): (n, 2) deduplicated POI longitudes and latitudes.
+        origin_lonlat (np.ndarray): (m, 2) origin longitudes and latitudes.
+        radii (tuple): Walk radii in meters.
+        bandwidth (float): Optional Gaussian kernel bandwidth in meters.
+    Returns:
+        dict: Column name -> array of length m, as from poi_accessibility.
+    """
+    from pyproj import Transformer
+
+    results = poi_accessibility(np.empty((0, 2)), origin_lonlat, radii, bandwidth)
+    if len(poi_lonlat) == 0 or len(origin_lonlat) == 0:
+        return results
+
+    zones = utm_epsg(origin_lonlat[:, 0], origin_lonlat[:, 1])
+    margin = accessibility_margin(radii, bandwidth)
+    for zone in np.unique(zones):
+        in_zone = zones == zone
+        zone_bounds = (*origin_lonlat[in_zone].min(axis=0), *origin_lonlat[in_zone].max(axis=0))
+        minx, miny, maxx, maxy = expand_bounds(zone_bounds, margin)
+        near = ((poi_lonlat[:, 0] >= minx) & (poi_lonlat[:, 0] <= maxx)
+                & (poi_lonlat[:, 1] >= miny) & (poi_lonlat[:, 1] <= maxy))
+        transformer = Transformer.from_crs("EPSG:4326", f"EPSG:{zone}", always_xy=True)
+        poi_xy = np.column_stack(transformer.transform(poi_lonlat[near, 0], poi_lonlat[near, 1]))
+        origin_xy = np.column_stack(transformer.transform(origin_lonlat[in_zone, 0], origin_lonlat[in_zone, 1]))
+        for column, values in poi_accessibility(poi_xy, origin_xy, radii, bandwidth).items():
+            results[column][in_zone] = values
+    return results
+def calculate_cdi(input_geojson, output_prefix, year, aggregate_store=None, accessibility=False, radii=(400, 800),
+                  bandwidth=None, sample_points=None, weight_column=None):
+    """
+    Calculates Commercial Density Index (CDI) for a given GeoJSON input file, year, and outputs the results.
+    Args:
+        input_geojson (str): Path to the input GeoJSON file containing tract polygons.
+        output_prefix (str): Prefix for output files.
+        year (int): Year for which CDI is calculated.
+        aggregate_store (str): Path of the SQLite aggregate store, or None for the configured store.
+        accessibility (bool): Also compute distance-based accessibility (see poi_accessibility) next to the density.
+        radii (tuple): Walk radii in meters for the accessibility counts.
+        bandwidth (float): Optional Gaussian kernel bandwidth in meters for a kernel-weighted POI sum.
+        sample_points (str): Optional file of origin points (e.g. block group centroids) whose 'GEOID' starts
+            with the tract GEOID. Tract values are then the weighted mean over its points instead of
+            the value at the tract centroid.
+        weight_column (str): Column of sample_points used as weights, e.g. 'Population Count'.
+    """
+    import geopandas as gpd
+    from shapely.geometry import mapping
+
+    # Load GeoJSON data
+    data = gpd.read_file(input_geojson)
+    bounds = data.to_crs(epsg=4326).bounds.to_numpy()
+    data = data.to_crs(epsg=3857)
+    
+    # Prepare storage for commercial counts and densities
+    commercial_counts = []
+    commercial_densities = []
+    
+    # Process each polygon
+    print(f"Processing year {year}...")
+    all_poi_points = {}
+    margin = accessibility_margin(radii, bandwidth) if accessibility else 0
+    for idx, polygon_bounds in enumerate(bounds):
+        print(f"  Fetching commercial data for polygon {idx + 1}/{len(data)}...")
+        try:
+            if margin:
+                polygon_bounds = expand_bounds(polygon_bounds, margin)
+            poi_points = fetch_commercial_data(polygon_bounds, year)
+            all_poi_points.update(poi_points)
+        except Exception as e:
+            print(f"  Error processing polygon {idx + 1}: {e}")
+    
+    # Create a GeoDataFrame of all points of interest; keying by OSM id drops nodes fetched by more than one
+    # overlapping bbox while keeping distinct nodes that share a position
+    poi_coords = np.array([(point.x, point.y) for point in all_poi_points.values()]).reshape(-1, 2)
+    all_poi_gdf = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(poi_coords[:, 0], poi_coords[:, 1]), crs="EPSG:4326"
+    ).to_crs(epsg=3857)
+    
+    # Perform spatial join to count POIs within each polygon
+    joined = gpd.sjoin(all_poi_gdf, data, how="inner", predicate="within")
+    counts = joined.groupby(joined.index_right).size().reindex(data.index, fill_value=0)
+    
+    # Calculate densities
+    densities = counts.values / data.geometry.area
+    max_density = densities.max() if densities.max() > 0 else 1
+    cdi = densities / max_density
+    
+    # Add results to the GeoDataFrame
+    data["Commercial Count"] = counts.values
+    data['Polygon Area'] = data.geometry.area
+    data["Commercial Density"] = densities
+    data["Coordinates"] = data.geometry.apply(lambda geom: mapping(geom)["coordinates"])
+    data["CDI"] = cdi
+    
+    columns_to_keep = ["GEOID", "Commercial Count", "Commercial Density", "CDI", "Polygon Area", "Coordinates", "geometry"]
+    accessibility_columns = {}
+    if accessibility:
+        if sample_points:
+            points = gpd.read_file(sample_points).to_crs(epsg=4326)
+            tract_positions = pd.Series(np.arange(len(data)), index=data["GEOID"].astype(str).to_numpy())
+            tract_length = data["GEOID"].astype(str).str.len().max()
+            groups = tract_positions.reindex(points["GEOID"].astype(str).str[:tract_length]).to_numpy()
+            keep = ~np.isnan(groups)
+            origin_lonlat = points.geometry.representative_point().get_coordinates().to_numpy()[keep]
+            groups = groups[keep].astype(int)
+            weights = points[weight_column].to_numpy(dtype=float)[keep] if weight_column else np.ones(keep.sum())
+        else:
+            origin_lonlat = data.geometry.centroid.to_crs(epsg=4326).get_coordinates().to_numpy()
+            groups = np.arange(len(data))
+            weights = np.ones(len(data))
+
+        # Weighted mean over each tract's origins; with centroids this is just the centroid value
+        total_weight = np.bincount(groups, weights=weights, minlength=len(data))
+        for column, values in projected_accessibility(poi_coords, origin_lonlat, radii, bandwidth).items():
+            weighted = np.bincount(groups, weights=weights * values, minlength=len(data))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                accessibility_columns[column] = np.where(total_weight > 0, weighted / total_weight, np.nan)
+            data[column] = accessibility_columns[column]
+        columns_to_keep[4:4] = list(accessibility_columns)
+    data = data[columns_to_keep]
+    
+    # Save results to GeoJSON and CSV
+    geojson_output = f"{output_prefix}_{year}_CDI.geojson"
+    csv_output = f"{output_prefix}_{year}_CDI.csv"
+    data.to_crs(epsg=4326).to_file(geojson_output, driver="GeoJSON")
+    data.drop(columns=["geometry"]).to_csv(csv_output, index=False)
+    
+    # Upsert raw values into the aggregate store, keyed by (GEOID, year, subindex)
+    store = AggregateStore(aggregate_store)
+    store.upsert("CDI", year, data["GEOID"], densities)
+    store_names = {f"POI Within {r}m": f"CDI_{r}M" for r in radii}
+    store_names["POI Kernel Sum"] = "CDI_KERNEL"
+    for column, values in accessibility_columns.items():
+        store.upsert(store_names[column], year, data["GEOID"], values)
+    
+    print(f"Results saved to {geojson_output} and {csv_output}.")
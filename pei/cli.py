@@ -0,0 +1,208 @@
+import argparse
+import importlib
+import os
+
+# Heavy dependencies (geopandas, shapely, census, requests) are only imported by the subindex modules, and
+# those are only imported once a subcommand runs, so --help and argument parsing stay fast.
+
+DEFAULT_YEARS = [2013, 2017, 2022]
+SUBINDICES = ["pdi", "cdi", "idi", "ldi"]
+
+
+def run_plan(args):
+    """Prints the dry-run plan for one subindex (--plan) or several (pei plan) without fetching anything."""
+    from .plan import plan_run, print_plan
+
+    subindices = args.subindices if args.command == "plan" else [args.command]
+    options = {}
+    if getattr(args, "accessibility", False):
+        options = dict(radii=tuple(args.radii), bandwidth=args.bandwidth)
+    plan = plan_run(args.input, subindices, args.years, concurrency=args.concurrency, sample=args.sample,
+                    overpass_url=args.count_url, **options)
+    print_plan(plan, args.concurrency)
+
+
+def run_subindex(args):
+    """Runs one subindex generator over every requested year."""
+    if args.plan:
+        return run_plan(args)
+    module = importlib.import_module(f".{args.command}", __package__)
+    for year in args.years:
+        if args.command == "pdi":
+            import geopandas as gpd
+
+            # get_tract_population renames columns in place, so each year starts from a fresh read
+            module.get_tract_population(
+                gpd.read_file(args.input), census_api_key=None, year=year,
+                output_file=f"{args.prefix}_{year}_PDI.geojson",
+                csv_output_file=f"{args.prefix}_{year}_PDI.csv",
+                aggregate_store=args.store,
+            )
+        else:
+            calculate = getattr(module, f"calculate_{args.command}")
+            options = {}
+            if args.command == "cdi" and args.accessibility:
+                options = dict(accessibility=True, radii=tuple(args.radii), bandwidth=args.bandwidth,
+                               sample_points=args.sample_points, weight_column=args.weight_column)
+            calculate(input_geojson=args.input, output_prefix=args.prefix, year=year, aggregate_store=args.store,
+                      **options)
+
+
+def run_pei(args):
+    from .composite import calculate_pei
+
+    for year in args.years:
+        calculate_pei(year, f"{args.prefix}_{year}_PEI.csv", f"{args.prefix}_{year}_PEI.geojson",
+                      input_prefix=args.prefix)
+
+
+def _parse_fill(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def run_scenarios(args):
+    from .scenarios import build_scenario_grid, run_scenarios as run
+
+    scenarios = build_scenario_grid(
+        weights=[[float(w) for w in weights.split(",")] for weights in args.weights] if args.weights else None,
+        fills=[_parse_fill(fill) for fill in args.fills] if args.fills else None,
+        normalizations=args.normalizations,
+        pdi_scales=args.pdi_scales,
+    )
+    run(args.years, scenarios, args.output, aggregate_store=args.store, states=args.states, chunk_size=args.chunk_size)
+
+
+def run_blockgroups(args):
+    from .blockgroups import run_blockgroup_rollup
+
+    run_blockgroup_rollup(args.input, args.years, output_prefix=args.prefix, city_file=args.cities,
+                          city_id=args.city_id)
+
+
+def run_import(args):
+    from .store import AggregateStore
+
+    for aggregate_file in args.files:
+        subindex = args.subindex or os.path.basename(aggregate_file).split("_")[0].upper()
+        count = AggregateStore(args.store).import_csv(aggregate_file, subindex)
+        print(f"Imported {count} {subindex} rows from {aggregate_file}")
+
+
+def run_sketch(args):
+    from .normalize import build_sketches, save_sketches
+
+    sketches = build_sketches(args.store, subindices=args.subindices, years=args.years, states=args.states, k=args.k)
+    save_sketches(sketches, args.output)
+    print(f"Saved {len(sketches)} sketches to {args.output}")
+
+
+def run_merge_sketches(args):
+    from .normalize import load_sketches, merge_sketches, save_sketches
+
+    merged = merge_sketches(load_sketches(path) for path in args.files)
+    save_sketches(merged, args.output)
+    print(f"Merged {len(args.files)} files into {len(merged)} sketches in {args.output}")
+
+
+def run_normalize(args):
+    from .normalize import apply_normalization, load_sketches
+
+    count = apply_normalization(load_sketches(args.sketches), args.store, method=args.method, states=args.states)
+    print(f"Wrote {count} normalized values")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pei", description="Pedestrian Environment Index generators.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help, func, input_default="tracts.geojson", prefix_default="tracts", years=True):
+        sub = subparsers.add_parser(name, help=help)
+        if years:
+            sub.add_argument("--years", type=int, nargs="+", default=DEFAULT_YEARS, help="Years to process.")
+        if input_default:
+            sub.add_argument("--input", default=input_default, help="Input GeoJSON of polygons.")
+        if prefix_default:
+            sub.add_argument("--prefix", default=prefix_default, help="Prefix of the per-year output files.")
+        sub.set_defaults(func=func)
+        return sub
+
+    def add_plan_arguments(sub):
+        sub.add_argument("--concurrency", type=int, help="Requests in flight at once (default: config or 1).")
+        sub.add_argument("--sample", type=int, default=0,
+                         help="Uncached requests per subindex and year to size with `out count` queries.")
+        sub.add_argument("--count-url", help="Overpass endpoint for the `out count` samples, e.g. a local instance.")
+
+    for name in SUBINDICES:
+        sub = add_command(name, f"Compute the {name.upper()} subindex for tracts.", run_subindex)
+        sub.add_argument("--store", help="SQLite aggregate store (default: config or PEI_aggregates.sqlite).")
+        sub.add_argument("--plan", action="store_true", help="Estimate requests, payload and runtime without fetching.")
+        add_plan_arguments(sub)
+        if name == "cdi":
+            sub.add_argument("--accessibility", action="store_true",
+                             help="Also compute POI counts within walk radii of each tract (needs scipy).")
+            sub.add_argument("--radii", type=int, nargs="+", default=[400, 800], help="Walk radii in meters.")
+            sub.add_argument("--bandwidth", type=float, help="Gaussian kernel bandwidth in meters for a weighted POI sum.")
+            sub.add_argument("--sample-points", help="Origin points (e.g. block group centroids) instead of tract centroids.")
+            sub.add_argument("--weight-column", help="Weight column of --sample-points, e.g. 'Population Count'.")
+
+    sub = add_command("plan", "Estimate requests, payload and runtime of a run without fetching.", run_plan)
+    sub.add_argument("--subindices", nargs="+", choices=SUBINDICES, default=SUBINDICES)
+    add_plan_arguments(sub)
+
+    add_command("pei", "Combine the subindex outputs into PEI.", run_pei, input_default=None)
+
+    sub = add_command("scenarios", "Evaluate PEI over a grid of weights, fills and normalizations.", run_scenarios,
+                      input_default=None, prefix_default=None)
+    sub.add_argument("--store", help="SQLite aggregate store to read raw values from.")
+    sub.add_argument("--states", nargs="+", help="Two-digit state FIPS codes to restrict the tracts to.")
+    sub.add_argument("--weights", nargs="+", help="Comma-separated PDI,CDI,IDI,LDI weight vectors.")
+    sub.add_argument("--fills", nargs="+", help="Null-fill values or strategies (mean, median, min).")
+    sub.add_argument("--normalizations", nargs="+", choices=["max", "percentile", "zscore"])
+    sub.add_argument("--pdi-scales", type=float, nargs="+", help="PDI multipliers, e.g. 1 100.")
+    sub.add_argument("--output", default="tracts_PEI_scenarios.parquet", help=".parquet or .csv output file.")
+    sub.add_argument("--chunk-size", type=int, default=16, help="Scenarios evaluated per broadcast block.")
+
+    sub = add_command("blockgroups", "Compute block group measures and roll them up to tracts, counties and cities.",
+                      run_blockgroups, input_default="blockgroups.geojson", prefix_default="blockgroups")
+    sub.add_argument("--cities", help="City boundary file, e.g. CityBoundaries.shp.")
+    sub.add_argument("--city-id", default="STPLFIPS", help="Column identifying each city.")
+
+    sub = add_command("sketch", "Summarize stored raw values as mergeable sketches, one per subindex and year.",
+                      run_sketch, input_default=None, prefix_default=None, years=False)
+    sub.add_argument("--years", type=int, nargs="+", help="Years to sketch (default: all in the store).")
+    sub.add_argument("--subindices", nargs="+", help="Subindices to sketch, e.g. PDI CDI (default: all).")
+    sub.add_argument("--states", nargs="+", help="Two-digit state FIPS codes of this shard (default: all).")
+    sub.add_argument("--k", type=int, default=200, help="Sketch size; larger is more accurate.")
+    sub.add_argument("--store", help="SQLite aggregate store to read raw values from.")
+    sub.add_argument("--output", required=True, help="JSON file to write the sketches to.")
+
+    sub = add_command("merge-sketches", "Merge shard sketch files.", run_merge_sketches,
+                      input_default=None, prefix_default=None, years=False)
+    sub.add_argument("files", nargs="+", help="Sketch files written by pei sketch.")
+    sub.add_argument("--output", required=True, help="JSON file to write the merged sketches to.")
+
+    sub = add_command("normalize", "Normalize stored raw values with merged sketches into <subindex>_NORM.",
+                      run_normalize, input_default=None, prefix_default=None, years=False)
+    sub.add_argument("--sketches", required=True, help="Merged sketch file.")
+    sub.add_argument("--method", default="max", help="'max' or a percentile such as 'p99' (default max).")
+    sub.add_argument("--states", nargs="+", help="Two-digit state FIPS codes to normalize (default: all).")
+    sub.add_argument("--store", help="SQLite aggregate store holding the raw values.")
+
+    sub = add_command("import-aggregates", "Load legacy *_tract_all.csv files into the aggregate store.", run_import,
+                      input_default=None, prefix_default=None, years=False)
+    sub.add_argument("files", nargs="+", help="Files such as PDI_tract_all.csv.")
+    sub.add_argument("--subindex", help="Subindex of every file (default: taken from the file name).")
+    sub.add_argument("--store", help="SQLite aggregate store (default: config or PEI_aggregates.sqlite).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
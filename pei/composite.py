@@ -1,17 +1,18 @@
-import pandas as pd
-import geopandas as gpd
 import os
+import pandas as pd
+
+def calculate_pei(year, output_csv, output_geojson, input_prefix="tracts"):
+    import geopandas as gpd
 
-def calculate_pei(year, output_csv, output_geojson):
     # File prefixes for the components of PEI
     components = ["PDI", "CDI", "IDI", "LDI"]
     
     # Initialize a dictionary to store component data
     component_data = {}
     
-    # Read relevant year-specific CSV and GeoJSON files
+    # Read relevant year-specific CSV and GeoJSON files written by the generators with the same prefix
     for component in components:
-        file_csv = f"tracts_{year}_{component}.csv"
+        file_csv = f"{input_prefix}_{year}_{component}.csv"
         if os.path.exists(file_csv):
             component_data[component] = pd.read_csv(file_csv)[['GEOID', component]]
         else:
@@ -51,7 +52,7 @@ def calculate_pei(year, output_csv, output_geojson):
     final_df.to_csv(output_csv, index=False)
 
     # Load the GeoJSON file for geometry and coordinates
-    geojson_file = f"tracts_{year}_PDI.geojson"
+    geojson_file = f"{input_prefix}_{year}_PDI.geojson"
     if os.path.exists(geojson_file):
         gdf = gpd.read_file(geojson_file)
         # Merge PEI scores into the GeoJSON DataFrame
@@ -66,10 +67,3 @@ def calculate_pei(year, output_csv, output_geojson):
         print(f"Missing GeoJSON file: {geojson_file}")
         return
     return
-
-# Define years and output file paths
-years = [2013, 2017, 2022]
-for year in years:
-    output_csv = f"tracts_{year}_PEI.csv"
-    output_geojson = f"tracts_{year}_PEI.geojson"
-    calculate_pei(year, output_csv, output_geojson)
\ No newline at end of file
@@ -0,0 +1,53 @@
+import configparser
+import os
+
+DEFAULT_OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+
+# Searched in order; the first file that exists is used. PEI_CONFIG overrides the search.
+CONFIG_PATHS = ["pei.ini", os.path.join(os.path.expanduser("~"), ".config", "pei", "pei.ini")]
+
+
+def load_config():
+    """
+    Reads the [pei] section of the first config file found.
+    Returns:
+        dict: Settings from the config file, empty if there is none.
+    """
+    paths = [os.environ["PEI_CONFIG"]] if os.environ.get("PEI_CONFIG") else CONFIG_PATHS
+    for path in paths:
+        if os.path.exists(path):
+            parser = configparser.ConfigParser()
+            parser.read(path)
+            return dict(parser["pei"]) if parser.has_section("pei") else {}
+    return {}
+
+
+def get_setting(name, default=None):
+    """
+    Looks up a setting, preferring the PEI_<NAME> environment variable over the config file.
+    """
+    return os.environ.get(f"PEI_{name.upper()}") or load_config().get(name.lower(), default)
+
+
+def get_census_api_key(census_api_key=None):
+    """
+    Resolves the Census API key. Census API keys may be generated at https://api.census.gov/data/key_signup.html.
+
+    Checks, in order: the census_api_key argument, the CENSUS_API_KEY environment variable, census_api_key
+    in the config file, and a census_api_key.txt file in the current directory.
+    Raises:
+        ValueError: If no key is found.
+    """
+    census_api_key = census_api_key or os.environ.get("CENSUS_API_KEY") or get_setting("census_api_key")
+    if not census_api_key and os.path.exists("census_api_key.txt"):
+        with open("census_api_key.txt", "r") as file:
+            census_api_key = file.read().strip()
+    if not census_api_key:
+        raise ValueError("No Census API key found. Set CENSUS_API_KEY, add census_api_key to pei.ini, "
+                         "or create census_api_key.txt.")
+    return census_api_key
+
+
+def get_overpass_url():
+    """Returns the Overpass interpreter endpoint, overridable to point at a mirror or local instance."""
+    return os.environ.get("OVERPASS_URL") or get_setting("overpass_url", DEFAULT_OVERPASS_URL)
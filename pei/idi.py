@@ -1,34 +1,35 @@
-import requests
-import geopandas as gpd
-import csv
-from shapely.geometry import mapping
 from collections import defaultdict
-import os
-import pandas as pd
-# Function to fetch intersections using Overpass API
-def fetch_intersections_overpass(polygon, year):
+from .overpass import format_bbox, overpass_query
+from .store import AggregateStore
+def intersection_query(bounds, year):
     """
-    Fetches intersections using Overpass API, including implicit intersections where multiple ways share nodes.
+    Builds the Overpass query for highway nodes and ways in a (minx, miny, maxx, maxy) EPSG:4326 bounding box.
     """
-    polygon = gpd.GeoSeries([polygon], crs="EPSG:3857").to_crs(epsg=4326).iloc[0]
-    minx, miny, maxx, maxy = polygon.bounds
-    overpass_url = "http://overpass-api.de/api/interpreter"
-    query = f"""
+    bbox = format_bbox(bounds)
+    return f"""
     [out:json][timeout:60][date:"{year}-01-01T00:00:00Z"];
     (
-      node[highway]({miny},{minx},{maxy},{maxx});
-      way[highway]({miny},{minx},{maxy},{maxx});
+      node[highway]({bbox});
+      way[highway]({bbox});
     );
     out body;
     >;
     out skel qt;
     """
-    response = requests.get(overpass_url, params={'data': query})
-    if response.status_code != 200:
-        print(f"Error fetching data: {response.status_code}")
+# Function to fetch intersections using Overpass API
+def fetch_intersections_overpass(bounds, year):
+    """
+    Fetches intersections using Overpass API, including implicit intersections where multiple ways share nodes.
+    """
+    import requests
+
+    try:
+        response = overpass_query(intersection_query(bounds, year), kind="idi")
+    except requests.RequestException as e:
+        print(f"Error fetching data: {e}")
         return 0
 
-    data = response.json().get('elements', [])
+    data = response.get('elements', [])
     node_degree = defaultdict(int)
 
     for element in data:
@@ -40,16 +41,20 @@ def fetch_intersections_overpass(polygon, year):
     intersection_count = sum(1 for count in node_degree.values() if count > 1)
     return intersection_count
 # Function to calculate IDI for a given GeoJSON input, year, and output prefix
-def calculate_idi(input_geojson, output_prefix, year, aggregate_file):
+def calculate_idi(input_geojson, output_prefix, year, aggregate_store=None):
+    import geopandas as gpd
+    from shapely.geometry import mapping
+
     data = gpd.read_file(input_geojson)
+    bounds = data.to_crs(epsg=4326).bounds.to_numpy()
     data = data.to_crs(epsg=3857)  # Project to EPSG:3857 for area calculations
     areas = data.geometry.area
     geoids = data["GEOID"] if "GEOID" in data.columns else data["geoid"]
 
     intersection_counts = []
-    for idx, polygon in enumerate(data.geometry):
+    for idx, polygon_bounds in enumerate(bounds):
         print(f"Processing polygon {idx + 1}/{len(data.geometry)} for year {year}...")
-        intersection_count = fetch_intersections_overpass(polygon, year)
+        intersection_count = fetch_intersections_overpass(polygon_bounds, year)
         intersection_counts.append(intersection_count)
 
     # Calculate intersection density
@@ -73,16 +78,8 @@ def calculate_idi(input_geojson, output_prefix, year, aggregate_file):
     columns_to_keep = ["GEOID", "Intersection Count", "Intersection Density", "IDI", "Polygon Area", "Coordinates", "geometry"]
     data = data[columns_to_keep]
     
-    geoidandyear = data["GEOID"] + "+" + str(year)
-    # Append to aggregate file
-    aggregate_df = pd.DataFrame({
-        "GEOID": geoidandyear,
-        "Intersection Density": data["Intersection Density"]
-    })
-    if os.path.exists(aggregate_file):
-        aggregate_df.to_csv(aggregate_file, mode='a', header=False, index=False)
-    else:
-        aggregate_df.to_csv(aggregate_file, mode='w', header=True, index=False)
+    # Upsert raw values into the aggregate store, keyed by (GEOID, year, subindex)
+    AggregateStore(aggregate_store).upsert("IDI", year, data["GEOID"], data["Intersection Density"])
 
     # Save outputs as GeoJSON and CSV
     geojson_file = f"{output_prefix}_{year}_IDI.geojson"
@@ -91,22 +88,3 @@ def calculate_idi(input_geojson, output_prefix, year, aggregate_file):
     data.drop(columns="geometry").to_csv(csv_file, index=False)
 
     print(f"Processed {year}. Outputs saved to '{geojson_file}' and '{csv_file}'.")
-# Census Tracts
-calculate_idi(
-    input_geojson="tracts.geojson",  # Replace with your census tract GeoJSON file
-    output_prefix="tracts",
-    year="2013",
-    aggregate_file="IDI_tract_all.csv"
-)
-calculate_idi(
-    input_geojson="tracts.geojson",  # Replace with your census tract GeoJSON file
-    output_prefix="tracts",
-    year="2017",
-    aggregate_file="IDI_tract_all.csv"
-)
-calculate_idi(
-    input_geojson="tracts.geojson",  # Replace with your census tract GeoJSON file
-    output_prefix="tracts",
-    year="2022",
-    aggregate_file="IDI_tract_all.csv"
-)
@@ -1,17 +1,12 @@
-import geopandas as gpd
-import requests
-import csv
 import numpy as np
-from shapely.geometry import Polygon, LineString, mapping
-import os
-import pandas as pd
-# Define a function to fetch data from Overpass API for a polygon and a specific year
-def fetch_landuse_data(polygon, year):
-    print(f"fetching for year {year}")
-    polygon = gpd.GeoSeries([polygon], crs="EPSG:3857").to_crs(epsg=4326).iloc[0]
-    bounds = polygon.bounds  # (minx, miny, maxx, maxy)
-    bbox = f"{bounds[1]},{bounds[0]},{bounds[3]},{bounds[2]}"
-    query = f"""
+from .overpass import format_bbox, overpass_query
+from .store import AggregateStore
+def landuse_query(bounds, year):
+    """
+    Builds the Overpass query for land use ways and relations in a (minx, miny, maxx, maxy) EPSG:4326 bounding box.
+    """
+    bbox = format_bbox(bounds)
+    return f"""
     [out:json][date:"{year}-01-01T00:00:00Z"];
     (
       way["landuse"]({bbox});
@@ -19,15 +14,21 @@ def fetch_landuse_data(polygon, year):
     );
     out geom;
     """
+# Define a function to fetch data from Overpass API for a bounding box and a specific year
+def fetch_landuse_data(bounds, year):
+    import requests
+
+    print(f"fetching for year {year}")
     try:
-        response = requests.get("http://overpass-api.de/api/interpreter", params={'data': query}, timeout=60)
-        response.raise_for_status()
-        return response.json()
+        return overpass_query(landuse_query(bounds, year), kind="ldi", timeout=60)
     except requests.RequestException as e:
         print(f"Overpass API request failed: {e}")
         return None
 # Function to calculate LDI for a given GeoJSON input, year, and output prefix
-def calculate_ldi(input_geojson, output_prefix, year, aggregate_file):
+def calculate_ldi(input_geojson, output_prefix, year, aggregate_store=None):
+    import geopandas as gpd
+    from shapely.geometry import Polygon, LineString, mapping
+
     # Load GeoJSON data
     data = gpd.read_file(input_geojson)
 
@@ -36,12 +37,13 @@ def calculate_ldi(input_geojson, output_prefix, year, aggregate_file):
     landuse_dictionaries = []
 
     # Reproject to EPSG:3857 for area calculations
+    bounds = data.to_crs(epsg=4326).bounds.to_numpy()
     data = data.to_crs(epsg=3857)
 
-    for idx, polygon in enumerate(data.geometry):
+    for idx, polygon_bounds in enumerate(bounds):
         try:
             # Fetch land use data
-            landuse_data = fetch_landuse_data(polygon, year)
+            landuse_data = fetch_landuse_data(polygon_bounds, year)
             if not landuse_data or 'elements' not in landuse_data:
                 entropies.append(0)
                 landuse_dictionaries.append({})
@@ -99,16 +101,8 @@ def calculate_ldi(input_geojson, output_prefix, year, aggregate_file):
     columns_to_keep = ["GEOID", "Entropy", "LDI", "Polygon Area", "Coordinates", "geometry"]
     data = data[columns_to_keep]
     
-    geoidandyear = data["GEOID"] + "+" + str(year)
-    # Append to aggregate file
-    aggregate_df = pd.DataFrame({
-        "GEOID": geoidandyear,
-        "Entropy": data["Entropy"]
-    })
-    if os.path.exists(aggregate_file):
-        aggregate_df.to_csv(aggregate_file, mode='a', header=False, index=False)
-    else:
-        aggregate_df.to_csv(aggregate_file, mode='w', header=True, index=False)
+    # Upsert raw values into the aggregate store, keyed by (GEOID, year, subindex)
+    AggregateStore(aggregate_store).upsert("LDI", year, data["GEOID"], data["Entropy"])
 
     # Save outputs as GeoJSON and CSV
     geojson_file = f"{output_prefix}_{year}_LDI.geojson"
@@ -117,22 +111,3 @@ def calculate_ldi(input_geojson, output_prefix, year, aggregate_file):
     data.drop(columns="geometry").to_csv(csv_file, index=False)
 
     print(f"Processed {year}. Outputs saved to '{geojson_file}' and '{csv_file}'.")
-# Census Tracts
-calculate_ldi(
-    input_geojson="tracts.geojson",  # Replace with your census tract GeoJSON file
-    output_prefix="tracts",
-    year=2013,
-    aggregate_file="LDI_tract_all.csv"
-)
-calculate_ldi(
-    input_geojson="tracts.geojson",  # Replace with your census tract GeoJSON file
-    output_prefix="tracts",
-    year=2017,
-    aggregate_file="LDI_tract_all.csv"
-)
-calculate_ldi(
-    input_geojson="tracts.geojson",  # Replace with your census tract GeoJSON file
-    output_prefix="tracts",
-    year=2022,
-    aggregate_file="LDI_tract_all.csv"
-)
\ No newline at end of file
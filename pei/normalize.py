@@ -0,0 +1,104 @@
+import json
+import re
+import numpy as np
+from .sketch import QuantileSketch
+from .store import AggregateStore
+
+# Raw values are normalized by a scale taken from merged sketches instead of an in-process max, so each
+# shard only has to emit its sketches and normalization never touches geometry or refetches data.
+NORMALIZED_SUFFIX = "_NORM"
+
+
+def build_sketches(aggregate_store=None, subindices=None, years=None, states=None, k=200):
+    """
+    Sketches the raw values in an aggregate store, one sketch per (subindex, year).
+    Args:
+        aggregate_store (str): Path of the SQLite aggregate store, or None for the configured store.
+        subindices (list): Subindices to sketch, in any case. Defaults to every raw subindex in the store.
+        years (list): Years to sketch. Defaults to all.
+        states (list): Two-digit state FIPS codes of this shard. Defaults to all.
+        k (int): Sketch size; larger is more accurate.
+    Returns:
+        dict: (subindex, year) -> QuantileSketch.
+    Raises:
+        ValueError: If a requested subindex has no values in the store.
+    """
+    subindices = [subindex.upper() for subindex in subindices] if subindices else None
+    df = AggregateStore(aggregate_store).read(subindices=subindices, years=years, states=states)
+    df = df[~df["subindex"].str.endswith(NORMALIZED_SUFFIX)]
+    missing = sorted(set(subindices or []) - set(df["subindex"]))
+    if missing:
+        raise ValueError(f"No values for subindices {missing} in the aggregate store.")
+    return {
+        (subindex, int(year)): QuantileSketch(k=k).update(group["value"].to_numpy(dtype=float))
+        for (subindex, year), group in df.groupby(["subindex", "year"])
+    }
+
+
+def save_sketches(sketches, path):
+    with open(path, "w") as file:
+        json.dump({f"{subindex}:{year}": sketch.to_dict() for (subindex, year), sketch in sketches.items()}, file)
+
+
+def load_sketches(path):
+    with open(path, "r") as file:
+        data = json.load(file)
+    sketches = {}
+    for key, value in data.items():
+        subindex, year = key.rsplit(":", 1)
+        sketches[(subindex, int(year))] = QuantileSketch.from_dict(value)
+    return sketches
+
+
+def merge_sketches(sketch_sets):
+    """
+    Merges several shard sketch dicts into one, combining sketches with the same (subindex, year).
+    """
+    merged = {}
+    for sketches in sketch_sets:
+        for key, sketch in sketches.items():
+            if key in merged:
+                merged[key].merge(sketch)
+            else:
+                merged[key] = QuantileSketch.from_dict(sketch.to_dict())
+    return merged
+
+
+def normalization_scale(sketch, method="max"):
+    """
+    Returns the divisor for a normalization method: "max", or "pNN" for the NN-th percentile (e.g. "p99").
+    Percentile scaling keeps a single outlier tract from rescaling every other tract.
+    """
+    if method == "max":
+        scale = sketch.max
+    else:
+        match = re.fullmatch(r"p(\d+(?:\.\d+)?)", method)
+        if not match:
+            raise ValueError(f"Unknown normalization '{method}', expected 'max' or a percentile such as 'p99'.")
+        scale = sketch.quantile(float(match.group(1)) / 100)
+    return scale if np.isfinite(scale) and scale > 0 else 1.0
+
+
+def apply_normalization(sketches, aggregate_store=None, method="max", states=None):
+    """
+    Normalizes stored raw values with the scales of merged sketches and upserts them as <subindex>_NORM.
+    Values above a percentile scale are clipped to 1.
+    Args:
+        sketches (dict): Merged (subindex, year) -> QuantileSketch.
+        aggregate_store (str): Path of the SQLite aggregate store, or None for the configured store.
+        method (str): "max" or a percentile such as "p99".
+        states (list): Two-digit state FIPS codes to normalize; each shard can apply to its own tracts.
+    Returns:
+        int: Number of values written.
+    """
+    store = AggregateStore(aggregate_store)
+    written = 0
+    for (subindex, year), sketch in sorted(sketches.items()):
+        df = store.read(subindices=[subindex], years=[year], states=states)
+        if df.empty:
+            continue
+        scale = normalization_scale(sketch, method)
+        values = np.clip(df["value"].to_numpy(dtype=float) / scale, 0, 1)
+        written += store.upsert(f"{subindex}{NORMALIZED_SUFFIX}", year, df["GEOID"], values)
+        print(f"{subindex} {year}: {len(df)} values normalized by {method} = {scale:.6g}")
+    return written
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import time
+from .config import get_overpass_url, get_setting
+
+# Every Overpass response is cached on disk under the hash of its query, so reruns and resumed runs
+# never refetch, and the planner can tell which requests a run would actually send.
+DEFAULT_CACHE_DIR = ".overpass_cache"
+HISTORY_FILE = "history.jsonl"
+
+
+def get_cache_dir():
+    return get_setting("cache_dir", DEFAULT_CACHE_DIR)
+
+
+def format_bbox(bounds):
+    """
+    Formats (minx, miny, maxx, maxy) EPSG:4326 bounds as an Overpass "south,west,north,east" bbox.
+    Coordinates are fixed to 7 decimals (about 1 cm) so the same polygon always produces the same query.
+    """
+    minx, miny, maxx, maxy = bounds
+    return f"{miny:.7f},{minx:.7f},{maxy:.7f},{maxx:.7f}"
+
+
+def query_key(query, url=None):
+    """
+    Returns the cache key of a query sent to an endpoint, ignoring indentation and blank lines.
+    The endpoint is part of the key because mirrors and local instances can hold different data.
+    """
+    normalized = "\n".join(line.strip() for line in query.strip().splitlines() if line.strip())
+    return hashlib.sha256(f"{url or get_overpass_url()}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def cache_path(query, cache_dir=None, url=None):
+    key = query_key(query, url)
+    return os.path.join(cache_dir or get_cache_dir(), key[:2], f"{key}.json")
+
+
+def is_cached(query, cache_dir=None, url=None):
+    return os.path.exists(cache_path(query, cache_dir, url))
+
+
+def overpass_query(query, kind="", timeout=None):
+    """
+    Runs an Overpass query, reading from and writing to the on-disk response cache.
+
+    Each network fetch also appends its kind, payload size, element count and latency to the
+    cache's history.jsonl, which the planner uses to estimate future runs.
+    Args:
+        query (str): Overpass QL query.
+        kind (str): Label recorded in the history, e.g. "cdi".
+        timeout (float): Request timeout in seconds.
+    Returns:
+        dict: The parsed JSON response.
+    Raises:
+        requests.RequestException: If the request fails, returns an error status, or Overpass reports an
+            error in the "remark" of an otherwise successful response (e.g. a timeout or out-of-memory).
+    """
+    import requests
+
+    url = get_overpass_url()
+    path = cache_path(query, url=url)
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            return json.load(file)
+
+    start = time.time()
+    response = requests.get(url, params={'data': query}, timeout=timeout)
+    response.raise_for_status()
+    elapsed = time.time() - start
+    data = response.json()
+    # Overpass returns 200 with partial elements when a query fails at runtime; never cache those
+    remark = data.get("remark", "")
+    if "error" in remark.lower():
+        raise requests.RequestException(f"Overpass error from {url}: {remark}", response=response)
+
+    # Write to a temporary file and rename so concurrent readers never see a partial response
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(response.text)
+    os.replace(tmp_path, path)
+
+    record = {"kind": kind, "bytes": len(response.content), "elements": len(data.get("elements", [])),
+              "elapsed": elapsed}
+    with open(os.path.join(get_cache_dir(), HISTORY_FILE), "a") as file:
+        file.write(json.dumps(record) + "\n")
+    return data
+
+
+def read_history(cache_dir=None):
+    """
+    Reads the fetch history recorded by overpass_query.
+    Returns:
+        list: One dict per past network fetch.
+    """
+    path = os.path.join(cache_dir or get_cache_dir(), HISTORY_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
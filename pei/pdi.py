@@ -1,25 +1,27 @@
-import geopandas as gpd
 import pandas as pd
-from census import Census
-import os
+from .config import get_census_api_key
+from .store import AggregateStore
 
-def get_tract_population(census_gdf, census_api_key, year, output_file, csv_output_file, aggregate_file):
+def get_tract_population(census_gdf, census_api_key, year, output_file, csv_output_file, aggregate_store=None):
     """
     Retrieves population data for block groups based on a given year and saves the processed data to a file.
 
     Parameters:
         census_gdf (GeoDataFrame): The GeoDataFrame containing the geometries for the census block groups.
-        census_api_key (str): The Census API key.
+        census_api_key (str): The Census API key, or None to use the configured key.
         year (int): The year for which the data is retrieved (e.g., 2013, 2022).
         output_file (str): The filename where the processed data will be saved.
         csv_output_file (str): The filename for saving the processed CSV data.
+        aggregate_store (str): Path of the SQLite aggregate store, or None for the configured store.
 
     Returns:
         None: The function saves the processed data to the specified files.
     """
-    # Check if the API key is provided
-    if not census_api_key:
-        raise ValueError("API key must be provided as the 'census_api_key' parameter.")
+    import geopandas as gpd
+    from census import Census
+
+    # Fall back to the configured key if none is passed
+    census_api_key = get_census_api_key(census_api_key)
 
     # Gets state and county FIPS codes
     state_fips = census_gdf.STATEFP[0]
@@ -93,39 +95,7 @@ def get_tract_population(census_gdf, census_api_key, year, output_file, csv_outp
     csv_output.to_csv(csv_output_file, index=False)
     print(f"CSV data saved to {csv_output_file}")
     
-    # Append population density to aggregate file
-    geoidandyear = merged_gdf["GEOID"] + "+" + str(year)
-    aggregate_df = pd.DataFrame({
-        "GEOID": geoidandyear,
-        "Population Density": merged_gdf["Population Density"]
-    })
-    if os.path.exists(aggregate_file):
-        aggregate_df.to_csv(aggregate_file, mode='a', header=False, index=False)
-    else:
-        aggregate_df.to_csv(aggregate_file, mode='w', header=True, index=False)
+    # Upsert raw values into the aggregate store, keyed by (GEOID, year, subindex)
+    AggregateStore(aggregate_store).upsert("PDI", year, merged_gdf["GEOID"], merged_gdf["Population Density"])
 
     return merged_gdf
-# Tract execution
-
-census_api_key = "bb8ddb8b99dc18f4759d67d905c25e1486077c4d"  # ATHARVA's API KEY
-census_gdf = gpd.read_file('tracts.geojson')
-census_gdf_2013 = get_tract_population(
-    census_gdf, year=2013, census_api_key=census_api_key,
-    output_file="tracts_2013_PDI.geojson", #INSERT FILES
-    csv_output_file="tracts_2013_PDI.csv",
-    aggregate_file="PDI_tract_all.csv"
-)
-census_gdf = gpd.read_file('tracts.geojson')
-census_gdf_2017 = get_tract_population(
-    census_gdf, year=2017, census_api_key=census_api_key,
-    output_file="tracts_2017_PDI.geojson", #INSERT FILES
-    csv_output_file="tracts_2017_PDI.csv",
-    aggregate_file="PDI_tract_all.csv"
-)
-census_gdf = gpd.read_file('tracts.geojson')
-census_gdf_2022 = get_tract_population(
-    census_gdf, year=2022, census_api_key=census_api_key,
-    output_file="tracts_2022_PDI.geojson", #INSERT FILES
-    csv_output_file="tracts_2022_PDI.csv",
-    aggregate_file="PDI_tract_all.csv"
-)
\ No newline at end of file
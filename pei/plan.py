@@ -0,0 +1,153 @@
+import json
+import random
+import re
+import numpy as np
+import pandas as pd
+from .config import get_overpass_url, get_setting
+from .overpass import is_cached, read_history
+
+# Fallbacks used until the response cache has a fetch history for a subindex. PDI makes one Census
+# call per county instead of Overpass calls, so it always uses these.
+DEFAULT_REQUEST_BYTES = {"pdi": 20_000, "cdi": 50_000, "idi": 500_000, "ldi": 800_000}
+DEFAULT_ELEMENT_BYTES = {"cdi": 250, "idi": 120, "ldi": 1_500}
+DEFAULT_LATENCY = {"pdi": 1.0, "cdi": 3.0, "idi": 6.0, "ldi": 10.0}
+
+
+def _query_builders():
+    from .cdi import commercial_query
+    from .idi import intersection_query
+    from .ldi import landuse_query
+
+    return {"cdi": commercial_query, "idi": intersection_query, "ldi": landuse_query}
+
+
+def read_tracts(input_geojson):
+    """
+    Reads GEOIDs, counties and EPSG:4326 bounds from a GeoJSON file without building geometries.
+    Returns:
+        pd.DataFrame: Columns 'GEOID', 'county', 'minx', 'miny', 'maxx', 'maxy'.
+    """
+    with open(input_geojson, "r") as file:
+        features = json.load(file)["features"]
+
+    rows = []
+    for feature in features:
+        geometry = feature["geometry"]
+        rings = geometry["coordinates"]
+        if geometry["type"] == "MultiPolygon":
+            rings = [ring for polygon in rings for ring in polygon]
+        xy = np.concatenate([np.asarray(ring, dtype=float)[:, :2] for ring in rings])
+        properties = feature["properties"]
+        geoid = str(properties.get("GEOID") or properties.get("geoid"))
+        county = (str(properties["STATEFP"]) + str(properties["COUNTYFP"])
+                  if "STATEFP" in properties and "COUNTYFP" in properties else geoid[:5])
+        minx, miny = xy.min(axis=0)
+        maxx, maxy = xy.max(axis=0)
+        rows.append((geoid, county, minx, miny, maxx, maxy))
+    return pd.DataFrame(rows, columns=["GEOID", "county", "minx", "miny", "maxx", "maxy"])
+
+
+def count_query(query):
+    """Turns a feature query into one that only returns element counts."""
+    return re.sub(r"out [^;]*;", "out count;", query)
+
+
+def sample_element_count(query, overpass_url=None):
+    """
+    Runs the `out count` form of a query and returns the total number of elements it would return.
+    """
+    import requests
+
+    response = requests.get(overpass_url or get_overpass_url(), params={'data': count_query(query)}, timeout=60)
+    response.raise_for_status()
+    return sum(int(element.get("tags", {}).get("total", 0)) for element in response.json().get("elements", []))
+
+
+def _history_stats(history, subindex):
+    """Returns mean payload bytes, mean latency and bytes per element of past fetches, or None."""
+    records = [record for record in history if record.get("kind") == subindex]
+    if not records:
+        return None
+    total_elements = sum(record["elements"] for record in records)
+    return {
+        "bytes": float(np.mean([record["bytes"] for record in records])),
+        "elapsed": float(np.mean([record["elapsed"] for record in records])),
+        "element_bytes": sum(record["bytes"] for record in records) / total_elements if total_elements else None,
+    }
+
+
+def plan_run(input_geojson, subindices, years, concurrency=None, sample=0, overpass_url=None, radii=None,
+             bandwidth=None):
+    """
+    Estimates the requests, cache hits, payload and wall time of a run without fetching any feature data.
+
+    Payload per request comes from `out count` queries on a sample of uncached tracts when sample > 0
+    (point overpass_url at a local instance to keep this off the public servers), otherwise from the
+    response cache history, otherwise from DEFAULT_REQUEST_BYTES.
+    Args:
+        input_geojson (str): Path to the tract GeoJSON the run would read.
+        subindices (list): Any of "pdi", "cdi", "idi", "ldi".
+        years (list): Years the run would process.
+        concurrency (int): Requests in flight at once. Defaults to the "concurrency" setting, or 1.
+        sample (int): Number of uncached requests per subindex and year to size with `out count`.
+        overpass_url (str): Endpoint for the `out count` samples. Defaults to the configured Overpass URL.
+        radii (tuple): Walk radii of a `cdi --accessibility` run, whose CDI queries use bboxes grown by
+            accessibility_margin. None plans a plain CDI run.
+        bandwidth (float): Kernel bandwidth of a `cdi --accessibility` run.
+    Returns:
+        pd.DataFrame: One row per subindex and year.
+    """
+    concurrency = int(concurrency or get_setting("concurrency", 1))
+    tracts = read_tracts(input_geojson)
+    bounds = tracts[["minx", "miny", "maxx", "maxy"]].to_numpy()
+    history = read_history()
+    builders = _query_builders()
+    query_bounds = {subindex: bounds for subindex in builders}
+    if radii:
+        from .cdi import accessibility_margin, expand_bounds
+
+        margin = accessibility_margin(radii, bandwidth)
+        query_bounds["cdi"] = [expand_bounds(b, margin) for b in bounds]
+
+    rows = []
+    for subindex in subindices:
+        stats = _history_stats(history, subindex)
+        latency = stats["elapsed"] if stats else DEFAULT_LATENCY[subindex]
+        for year in years:
+            if subindex == "pdi":
+                total = tracts["county"].nunique()
+                hits = 0
+                request_bytes, source = DEFAULT_REQUEST_BYTES[subindex], "default"
+            else:
+                queries = [builders[subindex](b, year) for b in query_bounds[subindex]]
+                misses = [query for query in queries if not is_cached(query)]
+                total, hits = len(queries), len(queries) - len(misses)
+                if sample and misses:
+                    sampled = random.Random(year).sample(misses, min(sample, len(misses)))
+                    elements = np.mean([sample_element_count(query, overpass_url) for query in sampled])
+                    element_bytes = (stats or {}).get("element_bytes") or DEFAULT_ELEMENT_BYTES[subindex]
+                    request_bytes, source = elements * element_bytes, "sampled"
+                elif stats:
+                    request_bytes, source = stats["bytes"], "history"
+                else:
+                    request_bytes, source = DEFAULT_REQUEST_BYTES[subindex], "default"
+
+            to_fetch = total - hits
+            rows.append({
+                "subindex": subindex.upper(),
+                "year": year,
+                "requests": total,
+                "cache hits": hits,
+                "to fetch": to_fetch,
+                "est. MB": to_fetch * request_bytes / 10**6,
+                "est. hours": to_fetch * latency / concurrency / 3600,
+                "estimate source": source,
+            })
+    return pd.DataFrame(rows)
+
+
+def print_plan(plan, concurrency=None):
+    concurrency = int(concurrency or get_setting("concurrency", 1))
+    print(plan.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    print(f"Total: {plan['to fetch'].sum():,} requests to send ({plan['cache hits'].sum():,} cached), "
+          f"~{plan['est. MB'].sum():,.1f} MB, ~{plan['est. hours'].sum():,.1f} h at concurrency {concurrency}.")
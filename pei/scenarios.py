@@ -0,0 +1,219 @@
+import itertools
+import warnings
+import numpy as np
+import pandas as pd
+from .store import AggregateStore
+
+# Subindex order used along the last axis of every (scenario x year x tract x subindex) array
+COMPONENTS = ["PDI", "CDI", "IDI", "LDI"]
+NORMALIZATIONS = ["max", "percentile", "zscore"]
+
+
+def load_raw_components(years, aggregate_store=None, states=None):
+    """
+    Loads the raw subindex values written by the tract generators from the aggregate store into one array.
+    Args:
+        years (list): Years to load.
+        aggregate_store (str): Path of the SQLite aggregate store, or None for the configured store.
+        states (list): Optional two-digit state FIPS codes to restrict the tracts to.
+    Returns:
+        tuple: (geoids, raw, present) where geoids is the sorted union of GEOIDs over all years and components,
+            raw is a float array of shape (year, tract, component) with NaN where a value is missing, and
+            present is a (year, tract) mask of tracts with a stored row for every component that year. Like the
+            inner join in calculate_pei, only present tracts get a PEI; tract vintages change between years.
+    """
+    df = AggregateStore(aggregate_store).read(subindices=COMPONENTS, years=years, states=states)
+    stored = set(zip(df["year"], df["subindex"]))
+    for year in years:
+        for component in COMPONENTS:
+            if (year, component) not in stored:
+                raise FileNotFoundError(f"No {component} values for {year} in the aggregate store.")
+
+    geoids = pd.Index(sorted(df["GEOID"].unique()))
+    raw = np.full((len(years), len(geoids), len(COMPONENTS)), np.nan)
+    stored = np.zeros(raw.shape, dtype=bool)
+    cells = (
+        pd.Index(years).get_indexer(df["year"]),
+        geoids.get_indexer(df["GEOID"]),
+        pd.Index(COMPONENTS).get_indexer(df["subindex"]),
+    )
+    raw[cells] = df["value"].to_numpy(dtype=float)
+    stored[cells] = True
+    return geoids, raw, stored.all(axis=2)
+
+
+def build_scenario_grid(weights=None, fills=None, normalizations=None, pdi_scales=None):
+    """
+    Builds the cartesian product of PEI parameter choices.
+    Args:
+        weights (list): Weight vectors, one value per component in COMPONENTS order. Defaults to equal weights.
+        fills (list): Null-fill strategies: a number, or one of "mean", "median", "min". Defaults to [0.5].
+        normalizations (list): Any of NORMALIZATIONS. Defaults to ["max"].
+        pdi_scales (list): Multipliers applied to the normalized PDI (100 gives the 0-100 PDI that pdi.py writes
+            and calculate_pei reads). Numeric fills are not scaled; mean, median and min fills are. Defaults to [1].
+    Returns:
+        list: One dict per scenario with keys "weights", "fill", "normalization" and "pdi_scale".
+    """
+    weights = weights or [[0.25, 0.25, 0.25, 0.25]]
+    fills = fills or [0.5]
+    normalizations = normalizations or ["max"]
+    pdi_scales = pdi_scales or [1]
+
+    for w in weights:
+        if len(w) != len(COMPONENTS):
+            raise ValueError(f"Weights {w} must have one value per component {COMPONENTS}.")
+    for fill in fills:
+        if not isinstance(fill, (int, float)) and fill not in ("mean", "median", "min"):
+            raise ValueError(f"Unknown fill strategy '{fill}'.")
+    for normalization in normalizations:
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization '{normalization}', expected one of {NORMALIZATIONS}.")
+
+    return [
+        {"weights": tuple(float(x) for x in w), "fill": fill, "normalization": normalization, "pdi_scale": float(scale)}
+        for w, fill, normalization, scale in itertools.product(weights, fills, normalizations, pdi_scales)
+    ]
+
+
+def normalize(raw, method):
+    """
+    Normalizes raw subindex values per year and component across all tracts.
+    Args:
+        raw (np.ndarray): Array of shape (year, tract, component), NaN for missing values.
+        method (str): "max" divides by the maximum (as the generators do), "percentile" maps to the
+            percentile rank in [0, 1], and "zscore" clips the z-score to [-3, 3] and rescales it to [0, 1].
+    Returns:
+        np.ndarray: Array of the same shape with NaN preserved.
+    """
+    if method == "max":
+        max_value = np.nanmax(np.where(np.isnan(raw), -np.inf, raw), axis=1, keepdims=True)
+        max_value = np.where(max_value > 0, max_value, 1)
+        return raw / max_value
+    if method == "percentile":
+        n_years, n_tracts, n_components = raw.shape
+        columns = pd.DataFrame(raw.transpose(1, 0, 2).reshape(n_tracts, n_years * n_components))
+        ranks = columns.rank(pct=True, method="average").to_numpy()
+        return ranks.reshape(n_tracts, n_years, n_components).transpose(1, 0, 2)
+    if method == "zscore":
+        mean = np.nanmean(raw, axis=1, keepdims=True)
+        std = np.nanstd(raw, axis=1, keepdims=True)
+        z = (raw - mean) / np.where(std > 0, std, 1)
+        return (np.clip(z, -3, 3) + 3) / 6
+    raise ValueError(f"Unknown normalization '{method}', expected one of {NORMALIZATIONS}.")
+
+
+def _fill_values(normalized, fill):
+    """Returns the (year, 1, component) values used to replace nulls for one fill strategy."""
+    shape = (normalized.shape[0], 1, normalized.shape[2])
+    if isinstance(fill, (int, float)):
+        return np.full(shape, float(fill))
+    reducer = {"mean": np.nanmean, "median": np.nanmedian, "min": np.nanmin}[fill]
+    # A component whose stored values are all NULL in a year has no statistic; it falls back to 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        values = reducer(normalized, axis=1, keepdims=True)
+    return np.nan_to_num(values, nan=0.0)
+
+
+def evaluate_scenarios(raw, scenarios, chunk_size=16):
+    """
+    Evaluates PEI for every scenario, year and tract with NumPy broadcasting.
+
+    PEI generalizes the original ((1 + PDI)(1 + IDI)(1 + LDI)(1 + CDI)) / 16 to weighted form
+    prod((1 + x_c) ** (4 * w_c)) / 16. Equal weights, fill 0.5, "max" normalization and pdi_scale 100 apply the
+    calculate_pei formula to max-normalized raw values, with PDI on 0-100 as pdi.py writes it. calculate_pei
+    itself reads the IDI and LDI columns of the generator CSVs, which are written as 0 placeholders, so its
+    output only matches where those two are zero.
+    Args:
+        raw (np.ndarray): Array of shape (year, tract, component) from load_raw_components.
+        scenarios (list): Scenario dicts from build_scenario_grid.
+        chunk_size (int): Scenarios evaluated per broadcast block, bounding peak memory.
+    Returns:
+        np.ndarray: PEI array of shape (scenario, year, tract).
+    """
+    # Normalize and compute fill values once per distinct choice, then index them per scenario
+    norm_methods = sorted({s["normalization"] for s in scenarios})
+    fill_choices = list(dict.fromkeys(s["fill"] for s in scenarios))
+    normalized = np.stack([normalize(raw, method) for method in norm_methods])
+    fill_values = np.stack([
+        np.stack([_fill_values(normalized[n], fill) for fill in fill_choices])
+        for n in range(len(norm_methods))
+    ])  # (normalization, fill, year, 1, component)
+
+    norm_idx = np.array([norm_methods.index(s["normalization"]) for s in scenarios])
+    fill_idx = np.array([fill_choices.index(s["fill"]) for s in scenarios])
+    exponents = 4 * np.array([s["weights"] for s in scenarios])  # (scenario, component)
+    scales = np.ones((len(scenarios), len(COMPONENTS)))
+    scales[:, COMPONENTS.index("PDI")] = [s["pdi_scale"] for s in scenarios]
+    # Mean, median and min fills come from the values they replace, so they follow the PDI scale; literal
+    # fills such as calculate_pei's 0.5 are used as given
+    statistical = np.array([not isinstance(s["fill"], (int, float)) for s in scenarios])
+    fill_scales = np.where(statistical[:, None], scales, 1.0)
+
+    pei = np.empty((len(scenarios), raw.shape[0], raw.shape[1]))
+    for start in range(0, len(scenarios), chunk_size):
+        block = slice(start, start + chunk_size)
+        values = normalized[norm_idx[block]]  # (block, year, tract, component)
+        # Scale before filling so literal fills stay unscaled; NaN stays NaN through the product
+        values = values * scales[block, None, None, :]
+        fills = fill_values[norm_idx[block], fill_idx[block]] * fill_scales[block, None, None, :]
+        values = np.where(np.isnan(values), fills, values)
+        log_terms = np.log1p(values) * exponents[block, None, None, :]
+        pei[block] = np.exp(log_terms.sum(axis=-1)) / 16
+    return pei
+
+
+def scenarios_to_frame(pei, scenarios, years, geoids, present=None):
+    """
+    Flattens a (scenario, year, tract) PEI array into one long columnar table.
+    Args:
+        present (np.ndarray): Optional (year, tract) mask from load_raw_components; other cells are dropped.
+    Returns:
+        pd.DataFrame: Columns scenario, year, GEOID, PEI and the scenario parameters.
+    """
+    n_scenarios, n_years, n_tracts = pei.shape
+    scenario_ids = np.repeat(np.arange(n_scenarios), n_years * n_tracts)
+    df = pd.DataFrame({
+        "scenario": scenario_ids,
+        "year": np.tile(np.repeat(np.asarray(years), n_tracts), n_scenarios),
+        "GEOID": pd.Categorical.from_codes(np.tile(np.arange(n_tracts), n_scenarios * n_years), categories=geoids),
+        "PEI": pei.reshape(-1),
+    })
+    params = pd.DataFrame([
+        {
+            **{f"w_{c}": w for c, w in zip(COMPONENTS, s["weights"])},
+            "fill": str(s["fill"]),
+            "normalization": s["normalization"],
+            "pdi_scale": s["pdi_scale"],
+        }
+        for s in scenarios
+    ])
+    for column in params.columns:
+        values = params[column].to_numpy()[scenario_ids]
+        df[column] = values if pd.api.types.is_numeric_dtype(params[column]) else pd.Categorical(values)
+    if present is not None:
+        df = df[np.tile(present.reshape(-1), n_scenarios)].reset_index(drop=True)
+    return df
+
+
+def run_scenarios(years, scenarios, output_file, aggregate_store=None, states=None, chunk_size=16):
+    """
+    Loads the stored raw values for all years, evaluates every scenario and writes one table.
+    Args:
+        years (list): Years to evaluate.
+        scenarios (list): Scenario dicts from build_scenario_grid.
+        output_file (str): Output path; .parquet writes Parquet, anything else CSV.
+        aggregate_store (str): Path of the SQLite aggregate store, or None for the configured store.
+        states (list): Optional two-digit state FIPS codes to restrict the tracts to.
+    """
+    geoids, raw, present = load_raw_components(years, aggregate_store, states)
+    print(f"Evaluating {len(scenarios)} scenarios over {len(years)} years and {len(geoids)} tracts...")
+    pei = evaluate_scenarios(raw, scenarios, chunk_size=chunk_size)
+    df = scenarios_to_frame(pei, scenarios, years, geoids, present)
+    if output_file.endswith(".parquet"):
+        df.to_parquet(output_file, index=False)
+    else:
+        df.to_csv(output_file, index=False)
+    print(f"Scenario results saved to {output_file}")
+    return df
+
@@ -0,0 +1,115 @@
+import math
+import random
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable summary of a stream of values: exact count, min, max, sum and sum of squares, plus a KLL
+    quantile sketch (Karnin, Lang and Liberty, 2016) whose rank error is about 1.7 / k.
+
+    Shards build one sketch per (subindex, year) over their own tracts; merging the shard sketches gives
+    the same max and approximately the same quantiles as a single sketch over every tract.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.compactors = [[]]
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level):
+        # Lower levels hold fewer items, shrinking geometrically by 2/3 below the top level
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values):
+        """Adds an iterable of values; NaN and infinite values are ignored."""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sum += float(values.sum())
+        self.sum_squares += float((values ** 2).sum())
+        self.compactors[0].extend(values.tolist())
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items = sorted(self.compactors[level])
+                # An odd item out stays at this level; every other item of the rest moves up with double weight
+                leftover = items[-1:] if len(items) % 2 else []
+                paired = items[:len(items) - len(leftover)]
+                self.compactors[level + 1].extend(paired[self._rng.randint(0, 1)::2])
+                self.compactors[level] = leftover
+            level += 1
+
+    def merge(self, other):
+        """Merges another sketch into this one and returns self."""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Returns the approximate q-quantile (0 <= q <= 1), or NaN for an empty sketch."""
+        if self.count == 0:
+            return math.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        values = np.concatenate([np.asarray(items, dtype=float) for items in self.compactors])
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.compactors)])
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(index, len(values) - 1)])
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    @property
+    def std(self):
+        if not self.count:
+            return math.nan
+        return math.sqrt(max(self.sum_squares / self.count - self.mean ** 2, 0.0))
+
+    def to_dict(self):
+        return {
+            "k": self.k, "count": self.count, "min": self.min, "max": self.max,
+            "sum": self.sum, "sum_squares": self.sum_squares, "compactors": self.compactors,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data["k"])
+        sketch.count = data["count"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.sum = data["sum"]
+        sketch.sum_squares = data["sum_squares"]
+        sketch.compactors = [list(items) for items in data["compactors"]]
+        return sketch
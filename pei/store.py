@@ -0,0 +1,108 @@
+import sqlite3
+import pandas as pd
+from .config import get_setting
+
+DEFAULT_STORE = "PEI_aggregates.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aggregates (
+    geoid TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    subindex TEXT NOT NULL,
+    state TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (geoid, year, subindex)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS aggregates_by_year ON aggregates (subindex, year, state);
+"""
+
+
+def get_store_path():
+    return get_setting("store", DEFAULT_STORE)
+
+
+class AggregateStore:
+    """
+    SQLite store of raw subindex values keyed by (GEOID, year, subindex), replacing the *_tract_all.csv files.
+
+    Writes are upserts, so rerunning a year or resuming a shard replaces rows instead of duplicating them.
+    The database runs in WAL mode and each call opens its own connection, so separate processes can write
+    concurrently (writers queue on the lock for up to `timeout` seconds) while readers are never blocked.
+    WAL needs a local filesystem; do not put the store on a network share.
+    """
+
+    def __init__(self, path=None, timeout=60):
+        self.path = path or get_store_path()
+        self.timeout = timeout
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def upsert(self, subindex, year, geoids, values):
+        """
+        Inserts or replaces the values of one subindex and year in a single transaction.
+        Args:
+            subindex (str): "PDI", "CDI", "IDI", "LDI" or another subindex name.
+            year (int): Year of the values.
+            geoids (iterable): GEOIDs; the first two digits are stored as the state for range reads.
+            values (iterable): One value per GEOID; NaN and None are stored as NULL.
+        """
+        rows = [
+            (str(geoid), int(year), subindex, str(geoid)[:2], None if pd.isna(value) else float(value))
+            for geoid, value in zip(geoids, values)
+        ]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO aggregates (geoid, year, subindex, state, value) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (geoid, year, subindex) DO UPDATE SET value = excluded.value",
+                    rows,
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def read(self, subindices=None, years=None, states=None):
+        """
+        Reads stored values, optionally restricted to some subindices, years and two-digit state FIPS codes.
+        Returns:
+            pd.DataFrame: Columns 'GEOID', 'year', 'subindex' and 'value'.
+        """
+        clauses, params = [], []
+        for column, selected in (("subindex", subindices), ("year", years), ("state", states)):
+            if selected:
+                selected = [int(v) for v in selected] if column == "year" else [str(v) for v in selected]
+                clauses.append(f"{column} IN ({', '.join('?' * len(selected))})")
+                params.extend(selected)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._connect()
+        try:
+            return pd.read_sql_query(
+                f"SELECT geoid AS GEOID, year, subindex, value FROM aggregates{where}", conn, params=params
+            )
+        finally:
+            conn.close()
+
+    def import_csv(self, aggregate_file, subindex):
+        """
+        Loads a legacy *_tract_all.csv file with composite "GEOID+year" keys. Later duplicate rows win.
+        Returns:
+            int: Number of rows upserted.
+        """
+        df = pd.read_csv(aggregate_file, dtype={"GEOID": str})
+        df[["GEOID", "year"]] = df["GEOID"].str.split("+", n=1, expand=True)
+        df = df.drop_duplicates(["GEOID", "year"], keep="last")
+        value_column = [c for c in df.columns if c not in ("GEOID", "year")][0]
+        return sum(
+            self.upsert(subindex, year, group["GEOID"], group[value_column])
+            for year, group in df.groupby("year")
+        )
@@ -0,0 +1,40 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+import requests
+from shapely.geometry import box
+import pei.blockgroups as blockgroups
+from pei.blockgroups import build_membership, compute_blockgroup_counts, compute_rollup_indices, rollup_counts
+
+
+@pytest.fixture
+def bg_gdf():
+    return gpd.GeoDataFrame(
+        {"GEOID": ["131210001001", "131210001002", "131210002001"]},
+        geometry=[box(-84.40, 33.70, -84.39, 33.71), box(-84.39, 33.70, -84.38, 33.71), box(-84.38, 33.70, -84.37, 33.71)],
+        crs="EPSG:4326",
+    )
+
+
+def test_rollup_includes_block_groups(bg_gdf):
+    counts = pd.DataFrame({
+        "GEOID": bg_gdf["GEOID"], "year": 2022, "Land Area": 1e6, "Polygon Area": 1e6,
+        "Population Count": [100.0, 300.0, 200.0], "Commercial Count": [1, 3, 2], "Intersection Count": [2, 2, 4],
+    })
+    totals = compute_rollup_indices(rollup_counts(counts, build_membership(bg_gdf))).set_index(["level", "unit"])
+
+    assert totals.loc[("blockgroup", "131210001002"), "PDI"] == pytest.approx(100)
+    assert totals.loc[("blockgroup", "131210001001"), "PDI"] == pytest.approx(100 / 3)
+    assert totals.loc[("tract", "13121000100"), "Population Count"] == 400
+    assert totals.loc[("county", "13121"), "Commercial Count"] == 6
+
+
+def test_failed_county_fetch_raises(bg_gdf, monkeypatch):
+    def fail(query, kind="", timeout=None):
+        raise requests.RequestException("runtime error: Query timed out")
+
+    monkeypatch.setattr(blockgroups, "overpass_query", fail)
+    monkeypatch.setattr(blockgroups, "get_blockgroup_population",
+                        lambda bg_gdf, census_api_key, year: pd.Series(1.0, index=bg_gdf["GEOID"]))
+    with pytest.raises(requests.RequestException):
+        compute_blockgroup_counts(bg_gdf, 2022, None)
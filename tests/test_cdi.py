@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from pyproj import Geod
+from pei.cdi import projected_accessibility, utm_epsg
+
+
+def test_utm_epsg():
+    assert utm_epsg(-84.39, 33.75) == 32616
+    assert utm_epsg(-149.9, 61.2) == 32606
+    assert utm_epsg(-70.6, -33.4) == 32719
+
+
+@pytest.mark.parametrize("lon, lat", [(-84.39, 33.75), (-157.86, 21.31), (-66.1, 18.47), (-149.9, 61.2), (-147.7, 64.8)])
+def test_walk_radii_match_geodesic_distances(lon, lat):
+    # POIs 2% inside and outside each radius, in every direction, must fall on the right side of it
+    geod = Geod(ellps="WGS84")
+    azimuths = np.arange(0, 360, 45.0)
+    pois = []
+    for distance in [400 * 0.98, 400 * 1.02, 800 * 0.98, 800 * 1.02]:
+        plon, plat, _ = geod.fwd(np.full(len(azimuths), lon), np.full(len(azimuths), lat), azimuths,
+                                 np.full(len(azimuths), distance))
+        pois.append(np.column_stack([plon, plat]))
+    results = projected_accessibility(np.concatenate(pois), np.array([[lon, lat]]), radii=(400, 800))
+
+    assert results["POI Within 400m"].tolist() == [len(azimuths)]
+    assert results["POI Within 800m"].tolist() == [3 * len(azimuths)]
+
+
+def test_pois_are_deduplicated_by_osm_id(tmp_path, monkeypatch):
+    import geopandas as gpd
+    import pandas as pd
+    from shapely.geometry import box
+    import pei.cdi as cdi
+
+    monkeypatch.chdir(tmp_path)
+    tracts = gpd.GeoDataFrame({"GEOID": ["13121000100", "13121000200"]},
+                              geometry=[box(-84.40, 33.70, -84.39, 33.71), box(-84.39, 33.70, -84.38, 33.71)],
+                              crs="EPSG:4326")
+    tracts.to_file("tracts.geojson", driver="GeoJSON")
+    # Two shops share one building point, and both tract bboxes return the same three nodes
+    elements = [{"type": "node", "id": 1, "lon": -84.395, "lat": 33.705},
+                {"type": "node", "id": 2, "lon": -84.395, "lat": 33.705},
+                {"type": "node", "id": 3, "lon": -84.385, "lat": 33.705}]
+    monkeypatch.setattr(cdi, "overpass_query", lambda query, kind="", timeout=None: {"elements": elements})
+
+    cdi.calculate_cdi("tracts.geojson", "out", 2022, aggregate_store=str(tmp_path / "store.sqlite"))
+    assert pd.read_csv("out_2022_CDI.csv")["Commercial Count"].tolist() == [2, 1]
@@ -0,0 +1,43 @@
+import json
+import pytest
+import requests
+from pei.overpass import is_cached, overpass_query, query_key
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.text = json.dumps(data)
+        self.content = self.text.encode("utf-8")
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PEI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("OVERPASS_URL", "http://localhost/api/interpreter")
+    return str(tmp_path)
+
+
+def test_remark_errors_raise_and_are_not_cached(cache_dir, monkeypatch):
+    response = FakeResponse({"elements": [], "remark": "runtime error: Query timed out in \"query\" at line 3."})
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: response)
+
+    with pytest.raises(requests.RequestException, match="Query timed out"):
+        overpass_query("[out:json];node(1,2,3,4);out;")
+    assert not is_cached("[out:json];node(1,2,3,4);out;")
+
+
+def test_responses_are_cached_per_endpoint(cache_dir, monkeypatch):
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: FakeResponse({"elements": [{"id": 1}]}))
+    query = "[out:json];node(1,2,3,4);out;"
+
+    assert overpass_query(query)["elements"] == [{"id": 1}]
+    assert is_cached(query)
+    assert not is_cached(query, url="http://overpass-api.de/api/interpreter")
+    assert query_key(query) != query_key(query, url="http://overpass-api.de/api/interpreter")
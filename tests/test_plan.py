@@ -0,0 +1,25 @@
+import json
+from pei.cdi import accessibility_margin, commercial_query, expand_bounds
+from pei.overpass import cache_path
+from pei.plan import plan_run
+
+
+def test_accessibility_plan_uses_expanded_bboxes(tmp_path, monkeypatch):
+    monkeypatch.setenv("PEI_CACHE_DIR", str(tmp_path / "cache"))
+    bounds = (-84.4, 33.7, -84.3, 33.8)
+    tracts = tmp_path / "tracts.geojson"
+    polygon = [[[-84.4, 33.7], [-84.3, 33.7], [-84.3, 33.8], [-84.4, 33.8], [-84.4, 33.7]]]
+    tracts.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"GEOID": "13121000100"}, "geometry": {"type": "Polygon", "coordinates": polygon}},
+    ]}))
+
+    # Cache the query an accessibility run would send for this tract
+    path = cache_path(commercial_query(expand_bounds(bounds, accessibility_margin((400, 800), 300)), 2022))
+    (tmp_path / "cache" / path.split("/")[-2]).mkdir(parents=True)
+    with open(path, "w") as file:
+        json.dump({"elements": []}, file)
+
+    plain = plan_run(str(tracts), ["cdi"], [2022])
+    expanded = plan_run(str(tracts), ["cdi"], [2022], radii=(400, 800), bandwidth=300)
+    assert plain["cache hits"].tolist() == [0]
+    assert expanded["cache hits"].tolist() == [1]
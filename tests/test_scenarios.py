@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from pei.scenarios import build_scenario_grid, evaluate_scenarios, load_raw_components, scenarios_to_frame
+from pei.store import AggregateStore
+
+
+def test_only_tracts_present_in_a_year_get_pei(tmp_path):
+    path = str(tmp_path / "store.sqlite")
+    store = AggregateStore(path)
+    # 2010-vintage tract only exists in 2013, 2020-vintage tract only in 2022
+    for subindex in ["PDI", "CDI", "IDI", "LDI"]:
+        store.upsert(subindex, 2013, ["13121000100", "13121000200"], [1.0, 2.0])
+        store.upsert(subindex, 2022, ["13121000200", "13121000300"], [2.0, 4.0])
+
+    geoids, raw, present = load_raw_components([2013, 2022], path)
+    scenarios = build_scenario_grid()
+    df = scenarios_to_frame(evaluate_scenarios(raw, scenarios), scenarios, [2013, 2022], geoids, present)
+
+    assert sorted(zip(df["year"], df["GEOID"].astype(str))) == [
+        (2013, "13121000100"), (2013, "13121000200"), (2022, "13121000200"), (2022, "13121000300"),
+    ]
+    assert not df["PEI"].isna().any()
+
+
+def test_pdi_is_scaled_before_filling():
+    raw = np.array([[[np.nan, 1.0, 1.0, 1.0], [2.0, 1.0, 1.0, 1.0]]])
+    scenarios = build_scenario_grid(fills=[0.5], pdi_scales=[100])
+    pei = evaluate_scenarios(raw, scenarios)
+
+    # The missing PDI is filled with 0.5, not 0.5 * 100; the present one is 1 * 100
+    np.testing.assert_allclose(pei[0, 0, 0], 1.5 * 2 ** 3 / 16)
+    np.testing.assert_allclose(pei[0, 0, 1], 101 * 2 ** 3 / 16)
+
+
+def test_statistical_fills_follow_the_pdi_scale():
+    raw = np.array([[[np.nan, 1.0, 1.0, 1.0], [1.0, 1.0, 1.0, 1.0], [0.0, 1.0, 1.0, 1.0]]])
+    scenarios = build_scenario_grid(fills=["mean"], pdi_scales=[100])
+    pei = evaluate_scenarios(raw, scenarios)
+
+    # The missing PDI gets the mean of the scaled PDIs 100 and 0
+    np.testing.assert_allclose(pei[0, 0, 0], 51 * 2 ** 3 / 16)
+
+
+def test_missing_year_or_component_raises(tmp_path):
+    path = str(tmp_path / "store.sqlite")
+    store = AggregateStore(path)
+    for subindex in ["PDI", "CDI", "IDI"]:
+        store.upsert(subindex, 2013, ["13121000100"], [1.0])
+
+    with pytest.raises(FileNotFoundError, match="LDI values for 2013"):
+        load_raw_components([2013], path)
+    with pytest.raises(FileNotFoundError, match="PDI values for 2022"):
+        load_raw_components([2022], path)
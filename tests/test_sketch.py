@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from pei.normalize import build_sketches, normalization_scale
+from pei.sketch import QuantileSketch
+from pei.store import AggregateStore
+
+
+def rank_error(sketch, values, q):
+    return abs(np.searchsorted(np.sort(values), sketch.quantile(q), side="right") / len(values) - q)
+
+
+def test_merged_shards_match_single_pass():
+    values = np.random.default_rng(0).lognormal(size=50_000)
+    single = QuantileSketch(k=200).update(values)
+    merged = QuantileSketch(k=200)
+    for shard in np.array_split(values, 8):
+        merged.merge(QuantileSketch(k=200).update(shard))
+
+    for q in [0.01, 0.25, 0.5, 0.75, 0.9, 0.99]:
+        assert rank_error(single, values, q) < 0.02
+        assert rank_error(merged, values, q) < 0.02
+
+
+def test_merge_keeps_exact_count_min_max():
+    shards = [np.arange(0, 1000.0), np.arange(-5.0, 3.0), np.array([np.nan, 7e6, np.inf])]
+    merged = QuantileSketch()
+    for shard in shards:
+        merged.merge(QuantileSketch().update(shard))
+
+    assert merged.count == 1000 + 8 + 1
+    assert merged.min == -5.0
+    assert merged.max == 7e6
+    assert merged.quantile(0) == -5.0 and merged.quantile(1) == 7e6
+
+
+def test_dict_round_trip():
+    sketch = QuantileSketch(k=50).update(np.random.default_rng(1).normal(size=5_000))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert restored.std == sketch.std
+
+
+def test_normalization_scale():
+    sketch = QuantileSketch(k=200).update(np.arange(1, 10_001.0))
+
+    assert normalization_scale(sketch, "max") == 10_000
+    assert normalization_scale(sketch, "p99") == pytest.approx(9_900, rel=0.01)
+    assert normalization_scale(QuantileSketch().update([0.0, 0.0]), "max") == 1.0
+    with pytest.raises(ValueError):
+        normalization_scale(sketch, "median")
+
+
+def test_build_sketches_subindices_are_case_insensitive(tmp_path):
+    path = str(tmp_path / "store.sqlite")
+    AggregateStore(path).upsert("CDI", 2022, ["13121000100", "13121000200"], [1.0, 3.0])
+
+    sketches = build_sketches(path, subindices=["cdi"])
+    assert list(sketches) == [("CDI", 2022)]
+    with pytest.raises(ValueError, match="LDI"):
+        build_sketches(path, subindices=["cdi", "ldi"])
@@ -0,0 +1,31 @@
+from pei.store import AggregateStore
+
+
+def test_upsert_replaces_rows(tmp_path):
+    store = AggregateStore(str(tmp_path / "store.sqlite"))
+    store.upsert("PDI", 2013, ["13121000100", "01001020100"], [1.0, 2.0])
+    store.upsert("PDI", 2013, ["13121000100"], [3.0])
+
+    df = store.read().sort_values("GEOID")
+    assert df["GEOID"].tolist() == ["01001020100", "13121000100"]
+    assert df["value"].tolist() == [2.0, 3.0]
+
+
+def test_read_filters_by_state_and_year(tmp_path):
+    store = AggregateStore(str(tmp_path / "store.sqlite"))
+    store.upsert("CDI", 2013, ["13121000100", "01001020100"], [1.0, float("nan")])
+    store.upsert("CDI", 2022, ["13121000100"], [5.0])
+
+    df = store.read(subindices=["CDI"], years=[2013], states=["01"])
+    assert df["GEOID"].tolist() == ["01001020100"]
+    assert df["value"].isna().all()
+
+
+def test_import_csv_keeps_last_duplicate(tmp_path):
+    csv = tmp_path / "IDI_tract_all.csv"
+    csv.write_text("GEOID,Intersection Density\n13121000100+2013,1.0\n13121000100+2013,4.0\n13121000100+2022,2.0\n")
+    store = AggregateStore(str(tmp_path / "store.sqlite"))
+
+    assert store.import_csv(str(csv), "IDI") == 2
+    df = store.read(subindices=["IDI"]).sort_values("year")
+    assert df["value"].tolist() == [4.0, 2.0]